@@ -1,8 +1,22 @@
+import csv
+import io
+import itertools
 import os
+import shelve
 import sys
-from datetime import timedelta, datetime
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta, datetime, timezone
 
-from github import Github, Auth
+import orjson
+from github import Github, Auth, GithubException, RateLimitExceededException
+from urllib3.util.retry import Retry
+
+## retries to give to the github objects: connection and read errors are retried by PyGithub,
+## but error responses (rate limits, 5xx) are not, and come back as GithubException to the RateLimiter
+CONNECTION_RETRY = Retry( total = 3 , connect = 3 , read = 3 , status = 0 , other = 0 ,
+                          status_forcelist = None , respect_retry_after_header = False , backoff_factor = 1 )
 
 def write_table( data , repo_list , file = sys.stdout ):
     """writes view/clone data as a csv file
@@ -13,43 +27,199 @@ def write_table( data , repo_list , file = sys.stdout ):
         and values are corresponding value (eg, number of views for a given date for a given repo)
     """
 
-    print( "date" , *repo_list , sep = ',' , file=file )
-    for d in data:
-        print( d , *[data[d][r] for r in repo_list ] , sep = ',' , file=file )
+    writer = csv.writer( file , lineterminator = '\n' )
+    writer.writerow( [ "date" , *repo_list ] )
+    writer.writerows( [ d , *[data[d][r] for r in repo_list ] ] for d in data )
     
-def read_table( file ):
+def update_table_file( data , repo_list , filename ):
+    """writes view/clone data (see write_table) as a csv file named filename,
+    rewriting only the part of the file which differs from its current content.
+    As past days do not change, this is usually only the last lines (the days github still reports, and the new ones).
+    """
+    buffer = io.StringIO()
+    write_table( data , repo_list , file = buffer )
+    new_lines = buffer.getvalue().encode().splitlines( keepends = True )
+
+    if not os.path.exists( filename ):
+        with open( filename , 'wb' ) as OUT:
+            OUT.writelines( new_lines )
+        return
+
+    with open( filename , 'r+b' ) as FILE:
+        ## skipping the lines which are unchanged
+        n_same , offset = 0 , 0
+        for old_line in FILE:
+            if n_same == len(new_lines) or old_line != new_lines[n_same]:
+                break
+            n_same += 1
+            offset += len( old_line )
+
+        ## replacing the rest
+        FILE.seek( offset )
+        FILE.truncate()
+        FILE.writelines( new_lines[n_same:] )
+
+def read_table( file , date_cache = None ):
     """
     reads a csv file and returns it as a dictionary
     whose keys are datetime
     and values are dictionaries
         whose keys are repo name
-        and values are corresponding value (eg, number of views for a given date for a given repo)
+        and values are corresponding value (eg, number of views for a given date for a given repo),
+        as int, or "NA" when the repo was not tracked at that date
+
+    date_cache is an optional dictionary of already parsed dates (date string -> datetime), 
+    filled along the way. Sharing it between tables with the same dates parses each date only once.
     """
-    header = file.readline().strip()
-    repo_list = header.split(',')[1:]
+    if date_cache is None:
+        date_cache = {}
+
+    reader = csv.reader( file )
+    repo_list = next( reader )[1:]
     
     data = {}
     
-    for l in file:
-        sl = l.strip().split(',')
-        date = datetime.fromisoformat( sl[0] )
+    for sl in reader:
+        date = date_cache.get( sl[0] )
+        if date is None:
+            date = date_cache[ sl[0] ] = datetime.fromisoformat( sl[0] )
         data[ date ] = {}
         
         for i,count in enumerate( sl[1:] ):
-            data[ date ][ repo_list[i] ] = count
+            data[ date ][ repo_list[i] ] = int( count ) if count != "NA" else "NA"
     
     return data
 
-def get_metrics( repo , github_object , raise_error = True):
-    """ given 1 repository name and a github object, gather views and clones data.
+class RateLimiter:
+    """throttles the requests made through 1 github object according to its rate limit
+
+    after each request, the remaining number of requests and the reset time are read from the github object
+    (which updates them from the X-RateLimit-* headers of the responses).
+    Each request is reserved before being sent, so that threads sharing the github object
+    do not overshoot the remaining requests. When none remains, calls are held until the reset time.
+
+    Requests failing because of a rate limit (403 with rate limit headers, 429) or a server error (5xx)
+    are retried up to max_attempts times, waiting for the Retry-After header if present,
+    until the rate limit reset if it is exhausted, or with an exponential backoff (1, 2, 4, ... seconds) otherwise.
+
+    This expects github_object to be built with retry=CONNECTION_RETRY (or None): otherwise PyGithub retries these errors itself,
+    out of sight of the rate limiter, and raises a requests RetryError (not a GithubException) once it gives up.
+    """
+
+    def __init__( self , github_object , max_attempts = 5 ):
+        self.github_object = github_object
+        self.max_attempts = max_attempts
+        self.remaining = None
+        self.reset_at = 0
+        self.in_flight = 0 # requests reserved but not answered yet
+        self.condition = threading.Condition()
+
+    def update( self , headers = None ):
+        """updates the remaining number of requests and the reset time,
+        from the given response headers (PyGithub lowercases their names, but any case is accepted)
+        or, if they hold no rate limit, from what the github object recorded of the last response
+        """
+        headers = { k.lower() : v for k , v in ( headers or {} ).items() }
+        if 'x-ratelimit-remaining' in headers:
+            remaining = int( float( headers['x-ratelimit-remaining'] ) )
+            reset_at = int( float( headers.get( 'x-ratelimit-reset' , 0 ) ) )
+        else:
+            remaining , limit = self.github_object.requester.rate_limiting
+            if limit < 0: # no response with rate limit headers yet
+                return
+            reset_at = self.github_object.requester.rate_limiting_resettime
+
+        with self.condition:
+            self.remaining = remaining
+            self.reset_at = reset_at
+            self.condition.notify_all()
+
+    def wait( self ):
+        """blocks until a request can be made, and reserves it (see release)"""
+        with self.condition:
+            while self.remaining is not None and self.remaining - self.in_flight <= 1:
+                delay = self.reset_at - time.time()
+                if delay <= 0:
+                    self.remaining = None
+                    break
+                self.condition.wait( timeout = delay )
+            self.in_flight += 1
+
+    def release( self ):
+        """releases a request reserved by wait, once it has been answered"""
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def retry_delay( self , error , attempt ):
+        """returns the number of seconds to wait before retrying after the given error,
+        or None if the error is not worth retrying
+        """
+        headers = { k.lower() : v for k , v in ( error.headers or {} ).items() }
+        if 'retry-after' in headers:
+            return int( float( headers['retry-after'] ) )
+
+        rate_limited = isinstance( error , RateLimitExceededException ) or headers.get( 'x-ratelimit-remaining' ) == '0'
+        if rate_limited and 'x-ratelimit-reset' in headers:
+            return max( int( float( headers['x-ratelimit-reset'] ) ) - time.time() , 0 ) + 1
+
+        if rate_limited or error.status == 429 or 500 <= error.status < 600:
+            return 2 ** attempt
+
+        return None # eg, a 403 because of missing authorization: retrying will not help
+
+    def call( self , function , *args , **kwargs ):
+        """calls function(*args, **kwargs), throttled and retried according to the rate limit"""
+        for attempt in range( self.max_attempts ):
+            self.wait()
+            try:
+                result = function( *args , **kwargs )
+            except GithubException as e:
+                error = e
+                self.update( error.headers )
+                delay = self.retry_delay( error , attempt )
+            else:
+                self.update()
+                return result
+            finally:
+                self.release()
+
+            # outside of the except block: the request is released while waiting to retry
+            if delay is None or attempt == self.max_attempts - 1:
+                raise error
+            time.sleep( delay )
+
+class RateLimiterPool:
+    """distributes requests over several RateLimiter (eg, 1 per token), to multiply the effective rate limit
+
+    rate limiters are taken in turn, skipping to the one with the most remaining requests
+    (a rate limiter which has not made any request yet is considered to have the most remaining requests).
+    """
+
+    def __init__( self , rate_limiters ):
+        self.rate_limiters = list( rate_limiters )
+        self.rotation = itertools.cycle( self.rate_limiters )
+        self.lock = threading.Lock()
+
+    def pick( self ):
+        """returns the rate limiter to use for the next request"""
+        with self.lock:
+            candidates = [ next( self.rotation ) for _ in self.rate_limiters ]
+        return max( candidates , key = lambda rl : float('inf') if rl.remaining is None else rl.remaining )
+
+def get_metrics( repo , github_object , rate_limiter = None , raise_error = True):
+    """ given 1 repository (as returned by github_object.get_repo) and its github object, gather views and clones data.
 
     returns the data in a dictionary whose keys are 'view_count','view_unique','clone_count', or 'clone_unique'
     and whose values are dictionaries whose keys are datetime and value are the corresponding value (ie, number of views, or clone,..)
 
+    Requests go through rate_limiter (a RateLimiter wrapping github_object); one is created if none is given.
+
     If the raise_error argument is False, if the code fails to gather the repo data (likely because it lacks authorization) it returns the expected object without data
     Otherwise the thrown error is raised
     """
-    repo = github_object.get_repo( repo )
+    if rate_limiter is None:
+        rate_limiter = RateLimiter( github_object )
     
     data = {}
     data['view_count'] = {}
@@ -58,31 +228,35 @@ def get_metrics( repo , github_object , raise_error = True):
     data['clone_unique'] = {}
 
     try:
-        views = repo.get_views_traffic()
+        views = rate_limiter.call( repo.get_views_traffic )
         for v in views.views:
             data['view_count'][v.timestamp]  = v.count
             data['view_unique'][v.timestamp] = v.uniques
 
-        clones = repo.get_clones_traffic()
+        clones = rate_limiter.call( repo.get_clones_traffic )
         for c in clones.clones:
             data['clone_count'][c.timestamp]  = c.count
             data['clone_unique'][c.timestamp] = c.uniques
     except Exception as e:
         if raise_error:
             raise e
+        print( "could not gather the traffic of" , repo.full_name , ":" , e , file = sys.stderr )
 
     return data
 
-def get_referrers_and_paths( repo , github_object , raise_error = True):
-    """ given 1 repository name and a github object, gather top referrers and popular paths.
+def get_referrers_and_paths( repo , github_object , rate_limiter = None , raise_error = True):
+    """ given 1 repository (as returned by github_object.get_repo) and its github object, gather top referrers and popular paths.
 
     returns the data in a dictionary with keys 'referrers' and 'paths'
     each containing a list of dictionaries with the aggregated data over the last 14 days
 
+    Requests go through rate_limiter (a RateLimiter wrapping github_object); one is created if none is given.
+
     If the raise_error argument is False, if the code fails to gather the repo data (likely because it lacks authorization) it returns empty lists
     Otherwise the thrown error is raised
     """
-    repo = github_object.get_repo( repo )
+    if rate_limiter is None:
+        rate_limiter = RateLimiter( github_object )
     
     data = {}
     data['referrers'] = []
@@ -90,7 +264,7 @@ def get_referrers_and_paths( repo , github_object , raise_error = True):
 
     try:
         # Get top 10 referral sources (aggregated over last 14 days)
-        referrers = repo.get_top_referrers()
+        referrers = rate_limiter.call( repo.get_top_referrers )
         for r in referrers:
             data['referrers'].append({
                 'referrer': r.referrer,
@@ -99,7 +273,7 @@ def get_referrers_and_paths( repo , github_object , raise_error = True):
             })
 
         # Get top 10 popular paths (aggregated over last 14 days)
-        paths = repo.get_top_paths()
+        paths = rate_limiter.call( repo.get_top_paths )
         for p in paths:
             data['paths'].append({
                 'path': p.path,
@@ -110,10 +284,33 @@ def get_referrers_and_paths( repo , github_object , raise_error = True):
     except Exception as e:
         if raise_error:
             raise e
+        print( "could not gather the referrers and paths of" , repo.full_name , ":" , e , file = sys.stderr )
 
     return data
 
-def complement_data_structure( min_date,  max_date, repo_list, data = {} ):
+def read_cache( cache_file , date ):
+    """reads the on-disk cache of fetched data (a shelve file)
+    and returns the entries fetched on the given date (an iso formatted string),
+    as a dictionary whose keys are (endpoint, repo name) tuples
+    and values are the corresponding fetched data (eg, the output of get_metrics).
+    """
+    cache = {}
+    with shelve.open( cache_file ) as CACHE:
+        for key , ( fetch_date , value ) in CACHE.items():
+            if fetch_date == date:
+                endpoint , _ , repo = key.partition(':')
+                cache[ ( endpoint , repo ) ] = value
+    return cache
+
+def write_cache( cache_file , date , entries ):
+    """writes entries (a dictionary whose keys are (endpoint, repo name) tuples and values are the fetched data)
+    to the on-disk cache, as fetched on the given date. Entries already present for the same endpoint and repo are replaced.
+    """
+    with shelve.open( cache_file ) as CACHE:
+        for ( endpoint , repo ) , value in entries.items():
+            CACHE[ endpoint + ':' + repo ] = ( date , value )
+
+def complement_data_structure( min_date,  max_date, repo_list, data = None ):
     """creates or complement data structure to store 1 metric
     data is expected to be a dictionary
     whose keys are datetime
@@ -121,179 +318,229 @@ def complement_data_structure( min_date,  max_date, repo_list, data = {} ):
         whose keys are repo name
         and values are corresponding value (eg, number of views for a given date for a given repo)
     """
+    repos = tuple( repo_list )
+
+    if not data: ## no data yet -> all days are created at once, initialized at 0
+        return { min_date + timedelta(days=i) : dict.fromkeys( repos , 0 )
+                 for i in range( (max_date - min_date).days + 1 ) }
+
+    ## there is already data 
+    # -> update minimum date
+    min_date = min(min_date , min(data) )
+    # -> update maximum date
+    max_date = max(max_date , max(data) )
     
-    if len(data)>0: ## there is already data 
-        # -> update minimum date
-        min_date = min(min_date , *(data.keys()) )
-        # -> update maximum date
-        max_date = max(max_date , *(data.keys()) )
-        
-        # -> add repos data if they are absent. initialize their value to NA
-        for k in data:
-            for r in repo_list:
-                if not r in data[k]:
-                    data[k][r] = "NA"
+    # -> add repos data if they are absent. initialize their value to NA
+    for k in data:
+        for r in repo_list:
+            data[k].setdefault( r , "NA" )
     
     ## making sure we have data for all days. initializing all at 0
-    delta = timedelta(days=1)
-    current = min_date
-    while current <= max_date:
-        if not current in data: # date absent from the current data -> initialize all at 0
-            data[current] = { r:0 for r in repo_list }
-        current += delta
+    dates = [ min_date + timedelta(days=i) for i in range( (max_date - min_date).days + 1 ) ]
+    for d in dates:
+        if not d in data: # date absent from the current data -> initialize all at 0
+            data[d] = dict.fromkeys( repos , 0 )
         
     return data
 
 
-# using an access token
-auth = Auth.Token(os.environ["TRAFFIC_ACTION_TOKEN"])
+if __name__ == "__main__":
 
-# Public Web Github
-g = Github(auth=auth)
+    # using access tokens: several comma-separated tokens can be given in TRAFFIC_ACTION_TOKENS,
+    # otherwise the single TRAFFIC_ACTION_TOKEN is used
+    tokens = [ t.strip() for t in os.environ.get("TRAFFIC_ACTION_TOKENS", "").split(',') if t.strip() ]
+    if len(tokens) == 0:
+        tokens = [ os.environ["TRAFFIC_ACTION_TOKEN"] ]
 
+    ## number of threads sending requests in parallel
+    MAX_WORKERS = 16
 
-repo_list_file = sys.argv[1]
+    # Public Web Github, 1 client (and rate limit) per token.
+    # Each client keeps up to MAX_WORKERS connections alive, so that all the threads can reuse theirs
+    # (with the default pool of 10, the extra connections would be discarded and re-opened, TLS handshake included).
+    # PyGithub only retries connection and read errors (CONNECTION_RETRY): the RateLimiter retries the error responses,
+    # so that a client waiting for its rate limit reset is visible to the pool, which then sends the work to the other clients
+    rate_limiters = RateLimiterPool( RateLimiter( Github(auth=Auth.Token(t), pool_size=MAX_WORKERS, retry=CONNECTION_RETRY) ) for t in tokens )
 
 
-## files for view_count, view_unique, clone_count, clone_unique
-files = { 'view_count' : sys.argv[2],
-          'view_unique' : sys.argv[3],
-          'clone_count' : sys.argv[4],
-          'clone_unique' : sys.argv[5]}
+    repo_list_file = sys.argv[1]
 
-## files for referrers and paths (if provided)
-referrers_file = sys.argv[6] if len(sys.argv) > 6 else None
-paths_file = sys.argv[7] if len(sys.argv) > 7 else None
 
-## reading the repo list
-repo_list = []
-with open(repo_list_file) as IN:
-    for l in IN:
-        repo_list.append( l.strip() )
+    ## files for view_count, view_unique, clone_count, clone_unique
+    files = { 'view_count' : sys.argv[2],
+              'view_unique' : sys.argv[3],
+              'clone_count' : sys.argv[4],
+              'clone_unique' : sys.argv[5]}
 
+    ## files for referrers and paths (if provided)
+    referrers_file = sys.argv[6] if len(sys.argv) > 6 else None
+    paths_file = sys.argv[7] if len(sys.argv) > 7 else None
 
+    ## ensuring folders containing the output files are created,
+    ## before any request so that a bad output path fails early
+    all_paths = list( files.values() ) + [ p for p in ( referrers_file , paths_file ) if p ]
+    folders = { p.rpartition("/")[0] for p in all_paths } - { '' , '.' }
+    for folder in folders:
+        os.makedirs( folder , exist_ok = True )
 
-## reading the data we already have
-pre_data = {}
-for k in files:
-    pre_data[k] = {}
-    if os.path.exists(files[k]):
-        with open(files[k]) as IN:
-            pre_data[k] = read_table(IN)
+    ## reading the repo list
+    repo_list = []
+    with open(repo_list_file) as IN:
+        for l in IN:
+            repo_list.append( l.strip() )
 
 
-## gathering the data from github
-raw_data = {}
-referrers_data = {}
-paths_data = {}
-for r in repo_list:
-    raw_data[r] = get_metrics( repo = r, 
-                               github_object = g,
-                               raise_error = False )
-    
+
+    ## reading the data we already have
+    pre_data = {}
+    date_cache = {} # the tables share the same dates
+    for k in files:
+        pre_data[k] = {}
+        if os.path.exists(files[k]):
+            with open(files[k], newline='') as IN:
+                pre_data[k] = read_table(IN, date_cache = date_cache)
+
+
+    ## gathering the data from github
+    raw_data = {}
+    referrers_data = {}
+    paths_data = {}
+
+    ## repository objects resolved during this run (repo name -> Future of (rate limiter, repository object)).
+    ## The first caller for a repo registers the Future and does the lookup, the others wait for its result,
+    ## so that each repo is requested at most once, whichever code path asks for it
+    resolved_repos = {}
+    resolved_repos_lock = threading.Lock()
+
+    def resolve( repo ):
+        """gets the repository object of repo (a name), with the client having the most remaining requests.
+        returns the rate limiter of this client along with the repository object,
+        so that the later requests on this repository go through the same client.
+        The result is memoized in resolved_repos.
+
+        If the repository can not be resolved (even after retries), the error is reported and None is returned,
+        so that 1 failing repo does not prevent gathering the others
+        """
+        with resolved_repos_lock:
+            future = resolved_repos.get( repo )
+            first = future is None
+            if first:
+                future = resolved_repos[repo] = Future()
+
+        if first:
+            rate_limiter = rate_limiters.pick()
+            try:
+                future.set_result( ( rate_limiter , rate_limiter.call( rate_limiter.github_object.get_repo , repo ) ) )
+            except Exception as e:
+                print( "could not get the repository" , repo , ":" , e , file = sys.stderr )
+                future.set_result( None )
+
+        return future.result()
+
+    def fetch( function , rate_limiter , repo ):
+        """calls function (get_metrics or get_referrers_and_paths) on repo (a repository object) through rate_limiter"""
+        return function( repo = repo,
+                         github_object = rate_limiter.github_object,
+                         rate_limiter = rate_limiter,
+                         raise_error = False )
+
+    ## endpoints to query for each repo
+    endpoints = { 'metrics' : get_metrics }
     # Get referrers and paths if output files are specified
     if referrers_file or paths_file:
-        ref_path_data = get_referrers_and_paths( repo = r,
-                                                 github_object = g,
-                                                 raise_error = False )
-        referrers_data[r] = ref_path_data['referrers']
-        paths_data[r] = ref_path_data['paths']
+        endpoints['referrers_and_paths'] = get_referrers_and_paths
+
+    ## optional on-disk cache: github returns the same 14 days window all day long,
+    ## so data already fetched today (UTC) is reused rather than queried again.
+    ## Today's counts may then lag a bit, but they are refreshed by the next day's run.
+    cache_file = os.environ.get("TRAFFIC_CACHE_FILE")
+    today = datetime.now( timezone.utc ).date().isoformat()
+    cached = read_cache( cache_file , today ) if cache_file else {}
+
+    ## the requests are I/O bound, so they are sent in parallel threads (MAX_WORKERS of them).
+    ## views/clones and referrers/paths of a same repo are separate tasks, so they are gathered concurrently as well
+    to_fetch = [ ( e , r ) for r in repo_list for e in endpoints if not ( e , r ) in cached ]
+
+    with ThreadPoolExecutor( max_workers = MAX_WORKERS ) as executor:
+        # each repo is resolved once, and its repository object shared by all its endpoints
+        to_resolve = list( dict.fromkeys( r for e , r in to_fetch ) )
+        resolved = dict( zip( to_resolve , executor.map( resolve , to_resolve ) ) )
+
+        futures = { ( e , r ) : executor.submit( fetch , endpoints[e] , *resolved[r] )
+                    for e , r in to_fetch 
+                    if resolved[r] is not None }
+        results = { key : future.result() for key , future in futures.items() }
+
+    # only caching successful fetches: failed ones come back without any data
+    if cache_file:
+        write_cache( cache_file , today , { key : value for key , value in results.items()
+                                            if any( len(v) > 0 for v in value.values() ) } )
+    results.update( cached )
+
+    # results are collected in the order of the repo list, so that the output keeps this order
+    # (repos which could not be resolved get the same empty data as a failed fetch)
+    for r in repo_list:
+        raw_data[r] = results.get( ( 'metrics' , r ) , { k : {} for k in files } )
+
+        if 'referrers_and_paths' in endpoints:
+            ref_path_data = results.get( ( 'referrers_and_paths' , r ) , { 'referrers' : [] , 'paths' : [] } )
+            referrers_data[r] = ref_path_data['referrers']
+            paths_data[r] = ref_path_data['paths']
+
+
+    ## reshaping the new data like the tables: 1 dictionary per metric, whose keys are datetime
+    ## and values are dictionaries whose keys are repo name and values are the corresponding value
+    new_data = { k : {} for k in files }
+    for repo in raw_data:
+        for k in new_data:
+            for date,value in raw_data[repo][k].items():
+                new_data[k].setdefault( date , {} )[repo] = value
 
+    ## determining the time window of the data
+    all_dates = set().union( *new_data.values() )
+    min_date , max_date = min(all_dates) , max(all_dates)
 
-## determining the time window of the data
-all_dates = set()
-for r,data in raw_data.items():
-    for data2 in data.values():
-        all_dates.update( data2.keys() )
-min_date , max_date = min(all_dates) , max(all_dates)
+    ## adding the new dates to the data structure
+    data = {}
 
-## adding the new dates to the data structure
-data = {}
+    for k in pre_data:
+        data[k] = complement_data_structure( min_date,  max_date, 
+                                            repo_list=repo_list, 
+                                            data = pre_data[k] )
 
-for k in pre_data:
-    data[k] = complement_data_structure( min_date,  max_date, 
-                                        repo_list=repo_list, 
-                                        data = pre_data[k] )
 
+    ## adding the new data, 1 row update per date
+    for k in pre_data:
+        for date,row in new_data[k].items():
+            data[k][date].update( row )
 
-## adding the new data 
-for k in pre_data:
-    for repo in raw_data:
-        
-        for date,value in raw_data[repo][k].items():
-            data[k][date][repo] = value
 
+    ## writing data to files
+    for k in data:
+        update_table_file( data[k] , repo_list , files[k] )
 
-# ensuring folders containing the output files are created
-for k in data:
-    folder = k.rpartition("/")[0]
-    if folder != '' and folder != '.':
-        if not os.path.exists(folder):
-            os.makedirs(folder)
+    ## writing referrers and paths data (snapshot with current timestamp, appended to a JSON Lines file)
+    if referrers_file and referrers_data:
+        current_time = datetime.now()
 
-## writing data to files
-for k in data:
-    with open( files[k],'w') as OUT:
-        write_table( data[k] , repo_list , file = OUT )
+        snapshot = {
+            'timestamp': current_time.isoformat(),
+            'data': referrers_data
+        }
 
-## writing referrers and paths data (snapshot with current timestamp)
-import json
+        # Append new snapshot as 1 line (JSON Lines), without reading the history
+        with open(referrers_file, 'ab') as OUT:
+            OUT.write(orjson.dumps(snapshot, option=orjson.OPT_APPEND_NEWLINE))
 
-if referrers_file and referrers_data:
-    current_time = datetime.now()
-    
-    # Read existing data if file exists
-    existing_referrers = []
-    if os.path.exists(referrers_file):
-        with open(referrers_file, 'r') as IN:
-            try:
-                existing_referrers = json.load(IN)
-            except:
-                existing_referrers = []
-    
-    # Append new snapshot
-    snapshot = {
-        'timestamp': current_time.isoformat(),
-        'data': referrers_data
-    }
-    existing_referrers.append(snapshot)
-    
-    # Ensure folder exists
-    folder = referrers_file.rpartition("/")[0]
-    if folder != '' and folder != '.':
-        if not os.path.exists(folder):
-            os.makedirs(folder)
-    
-    # Write to file
-    with open(referrers_file, 'w') as OUT:
-        json.dump(existing_referrers, OUT, indent=2)
+    if paths_file and paths_data:
+        current_time = datetime.now()
 
-if paths_file and paths_data:
-    current_time = datetime.now()
-    
-    # Read existing data if file exists
-    existing_paths = []
-    if os.path.exists(paths_file):
-        with open(paths_file, 'r') as IN:
-            try:
-                existing_paths = json.load(IN)
-            except:
-                existing_paths = []
-    
-    # Append new snapshot
-    snapshot = {
-        'timestamp': current_time.isoformat(),
-        'data': paths_data
-    }
-    existing_paths.append(snapshot)
-    
-    # Ensure folder exists
-    folder = paths_file.rpartition("/")[0]
-    if folder != '' and folder != '.':
-        if not os.path.exists(folder):
-            os.makedirs(folder)
-    
-    # Write to file
-    with open(paths_file, 'w') as OUT:
-        json.dump(existing_paths, OUT, indent=2)
+        snapshot = {
+            'timestamp': current_time.isoformat(),
+            'data': paths_data
+        }
+
+        # Append new snapshot as 1 line (JSON Lines), without reading the history
+        with open(paths_file, 'ab') as OUT:
+            OUT.write(orjson.dumps(snapshot, option=orjson.OPT_APPEND_NEWLINE))
 
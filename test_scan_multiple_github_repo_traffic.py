@@ -0,0 +1,131 @@
+import http.server
+import json
+import threading
+import time
+import unittest
+
+from github import Github, Auth, GithubException
+
+from scan_multiple_github_repo_traffic import RateLimiter, CONNECTION_RETRY
+
+
+class FakeGithubServer( http.server.ThreadingHTTPServer ):
+    """local server answering every GET with the status, headers and message it is given"""
+
+    def __init__( self ):
+        super().__init__( ( '127.0.0.1' , 0 ) , FakeGithubHandler )
+        self.status , self.headers , self.message = 200 , {} , None
+        self.hits = 0
+        threading.Thread( target = self.serve_forever , daemon = True ).start()
+
+    def reply( self , status , headers , message = None ):
+        self.status , self.headers , self.message = status , headers , message
+
+    def github( self ):
+        return Github( auth = Auth.Token( 'x' ) , base_url = f'http://127.0.0.1:{self.server_port}' ,
+                       retry = CONNECTION_RETRY , seconds_between_requests = None )
+
+
+class FakeGithubHandler( http.server.BaseHTTPRequestHandler ):
+
+    def do_GET( self ):
+        self.server.hits += 1
+        body = { 'full_name' : 'a/b' } if self.server.message is None else { 'message' : self.server.message }
+        self.send_response( self.server.status )
+        self.send_header( 'Content-Type' , 'application/json' )
+        for k , v in self.server.headers.items():
+            self.send_header( k , v )
+        self.end_headers()
+        self.wfile.write( json.dumps( body ).encode() )
+
+    def log_message( self , *args ):
+        pass
+
+
+class TestRateLimiter( unittest.TestCase ):
+    """the errors are raised by PyGithub from real responses, so their headers are as PyGithub reports them"""
+
+    def setUp( self ):
+        self.server = FakeGithubServer()
+        self.github_object = self.server.github()
+
+    def tearDown( self ):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def raised_error( self ):
+        try:
+            RateLimiter( self.github_object , max_attempts = 1 ).call( self.github_object.get_repo , 'a/b' )
+        except GithubException as e:
+            return e
+        self.fail( 'no error raised' )
+
+    def test_retry_after( self ):
+        self.server.reply( 403 , { 'Retry-After' : '60' } , 'You have exceeded a secondary rate limit.' )
+        error = self.raised_error()
+        self.assertEqual( RateLimiter( self.github_object ).retry_delay( error , 0 ) , 60 )
+
+    def test_primary_rate_limit_waits_until_reset( self ):
+        reset_at = int( time.time() ) + 3600
+        self.server.reply( 403 , { 'X-RateLimit-Limit' : '5000' ,
+                                   'X-RateLimit-Remaining' : '0' ,
+                                   'X-RateLimit-Reset' : str( reset_at ) } , 'API rate limit exceeded for user.' )
+        error = self.raised_error()
+
+        rate_limiter = RateLimiter( self.github_object )
+        self.assertGreater( rate_limiter.retry_delay( error , 0 ) , 3500 )
+
+        rate_limiter.update( error.headers )
+        self.assertEqual( rate_limiter.remaining , 0 )
+        self.assertEqual( rate_limiter.reset_at , reset_at )
+
+    def test_authorization_error_not_retried( self ):
+        self.server.reply( 403 , { 'X-RateLimit-Limit' : '5000' , 'X-RateLimit-Remaining' : '4000' } ,
+                           'Resource not accessible by personal access token' )
+        error = self.raised_error()
+        self.assertIsNone( RateLimiter( self.github_object ).retry_delay( error , 0 ) )
+
+    def test_update_from_github_object( self ):
+        self.server.reply( 200 , { 'X-RateLimit-Limit' : '5000' ,
+                                   'X-RateLimit-Remaining' : '42' ,
+                                   'X-RateLimit-Reset' : '1700000000' } )
+        rate_limiter = RateLimiter( self.github_object )
+        rate_limiter.call( self.github_object.get_repo , 'a/b' )
+        self.assertEqual( rate_limiter.remaining , 42 )
+        self.assertEqual( rate_limiter.reset_at , 1700000000 )
+
+    def test_server_error_retried( self ):
+        self.server.reply( 502 , {} , 'Server Error' )
+        rate_limiter = RateLimiter( self.github_object , max_attempts = 2 )
+        with self.assertRaises( GithubException ):
+            rate_limiter.call( self.github_object.get_repo , 'a/b' )
+        self.assertEqual( self.server.hits , 2 )
+        self.assertEqual( rate_limiter.in_flight , 0 )
+
+    def test_error_responses_not_retried_by_pygithub( self ):
+        self.server.reply( 503 , { 'Retry-After' : '1' } , 'Service Unavailable' )
+        error = self.raised_error()
+        self.assertEqual( error.status , 503 )
+        self.assertEqual( self.server.hits , 1 )
+
+    def test_requests_reserved_before_being_sent( self ):
+        rate_limiter = RateLimiter( self.github_object )
+        rate_limiter.update( { 'X-RateLimit-Remaining' : '3' , 'X-RateLimit-Reset' : str( int( time.time() ) + 3600 ) } )
+
+        # 2 requests in flight: the last remaining one is kept, the next caller must wait
+        rate_limiter.wait()
+        rate_limiter.wait()
+        waiting = threading.Thread( target = rate_limiter.wait , daemon = True )
+        waiting.start()
+        waiting.join( timeout = 0.5 )
+        self.assertTrue( waiting.is_alive() )
+
+        # once a request is answered (and the remaining count unchanged), the waiting caller can go
+        rate_limiter.release()
+        waiting.join( timeout = 0.5 )
+        self.assertFalse( waiting.is_alive() )
+        self.assertEqual( rate_limiter.in_flight , 2 )
+
+
+if __name__ == '__main__':
+    unittest.main()